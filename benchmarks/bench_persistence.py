@@ -0,0 +1,53 @@
+"""Measures time, which SQLitePersistence takes from the event loop per update
+
+Every update refreshes data of the user and saves the data and conversation
+state, like the bot does with persistent conversations
+
+Usage: python benchmarks/bench_persistence.py [users]
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pixel_persistence import SQLitePersistence  # noqa: E402
+
+
+async def bench(path: str, users: int) -> None:
+    persistence = SQLitePersistence(path)
+    user_data = {"color_level_image": 16, "pixel_size_image": 8}
+
+    start = time.perf_counter()
+    for user_id in range(users):
+        await persistence.refresh_user_data(user_id, user_data)
+        await persistence.update_user_data(user_id, user_data)
+        await persistence.update_conversation("video", (user_id, user_id), 1)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await persistence.flush()
+    flushed = time.perf_counter() - start
+
+    print(f"{users} updates: {elapsed / users * 1000:.3f} ms per update")
+    print(f"flush of {users} users: {flushed * 1000:.1f} ms")
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/persistence.db"
+        asyncio.run(bench(path, users))
+
+        connection = sqlite3.connect(path)
+        rows = connection.execute("SELECT COUNT(*) FROM user_data").fetchone()[0]
+        connection.close()
+        assert rows == users, f"{rows} of {users} users were written"
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from telegram.error import TelegramError
 
 
@@ -9,3 +11,24 @@ class InvalidPixelSize(TelegramError):
 class InvalidColorLvl(TelegramError):
     def __init__(self) -> None:
         super().__init__("Invalid color level")
+
+
+class InvalidRegions(TelegramError):
+    def __init__(self) -> None:
+        super().__init__("Invalid regions")
+
+
+def error_reply(error: Exception) -> Optional[str]:
+    """Returns message for the user about the error
+
+    Args:
+        error (Exception): error raised while handling the update
+
+    Returns:
+        Optional[str]: message for the user, or None if the error isn't known
+    """
+    if isinstance(error, TelegramError):
+        match error.message:
+            case "File is too big":
+                return "Файл слишком большой!\nМаксимальный размер файла равен 20 МБ"
+    return None
@@ -1,14 +1,13 @@
+import asyncio
 import logging
 from io import BytesIO
 from os import remove
+from uuid import uuid4
 
-import cv2
-import numpy as np
 from telegram import Document, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
-from pixel_image import ImageHandler
-from pixel_video import VideoHandler
+from pixel_queue import TaskQueue, queue_task
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -31,15 +30,32 @@ async def anonymize_image(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     user = update.message.from_user
 
     if isinstance(update.message.effective_attachment, Document):
-        image_file = await update.message.effective_attachment.get_file()
+        attachment = update.message.effective_attachment
     else:
-        image_file = await update.message.photo[-1].get_file()
+        attachment = update.message.photo[-1]
 
-    image = await image_file.download_as_bytearray()
-    image = cv2.imdecode(np.asarray(image), cv2.IMREAD_COLOR)
+    if queue_task(update, TaskQueue.IMAGE_FACES, attachment.file_id):
+        logger.info("Queued image for anonymization, User %s", user.name)
+        await update.message.reply_text(
+            "Изображение обрабатывается, пожалуйста подождите..."
+        )
+
+        return ConversationHandler.END
+
+    # Processing dependencies are heavy, so they are loaded on first use
+    import cv2
+    import numpy as np
+
+    from pixel_image import ImageHandler
+
+    image_file = await attachment.get_file()
+
+    image = BytesIO()
+    await image_file.download_to_memory(image)
+    image = cv2.imdecode(np.frombuffer(image.getbuffer(), np.uint8), cv2.IMREAD_COLOR)
     logger.info("Received image for anonymization, User %s", user.name)
 
-    if not ImageHandler(image).pixelize_faces():
+    if not await asyncio.to_thread(ImageHandler(image).pixelize_faces):
         await update.message.reply_text("Лица не найдены.")
         logger.warning("Faces were not found in image, User %s", user.name)
 
@@ -57,9 +73,20 @@ async def anonymize_image(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def anonymize_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.message.from_user
 
+    if queue_task(
+        update, TaskQueue.VIDEO_FACES, update.message.effective_attachment.file_id
+    ):
+        logger.info("Queued video for anonymization, User %s", user.name)
+        await update.message.reply_text("Видео обрабатывается, пожалуйста подождите...")
+
+        return ConversationHandler.END
+
+    from pixel_video import VideoHandler
+
     video_file = await update.message.effective_attachment.get_file()
+    # The same video can be sent by several users at once
     file_id = video_file.file_unique_id
-    video = f"download/{file_id}.mp4"
+    video = f"download/{file_id}_{uuid4().hex}.mp4"
     await video_file.download_to_drive(video)
     logger.info("Received video for anonymization, User %s", user.name)
 
@@ -67,8 +94,8 @@ async def anonymize_video(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "Видео обрабатывается, пожалуйста подождите..."
     )
 
-    handler = VideoHandler(video)
-    pixelized_video = handler.anonymize()
+    handler = await asyncio.to_thread(VideoHandler, video)
+    pixelized_video = await asyncio.to_thread(handler.anonymize)
     if handler.faces_not_found():
         await context.bot.delete_message(reply.chat_id, reply.message_id)
         await update.message.reply_text("Лица не найдены.")
@@ -1,5 +1,6 @@
+from typing import Optional
+
 import cv2
-import face_recognition
 import numpy as np
 from numba import njit
 
@@ -20,6 +21,9 @@ class ImageHandler:
     pixelize_for_video(pixel_size: int)
         Image pixelization accelearated for sequentially processing of video frames
 
+    pixelize_regions(pixel_size: int, regions: list)
+        Pixelization of image regions with information about pixels size
+
     pixelize_faces()
         Pixelization of faces in image
     """
@@ -33,6 +37,7 @@ class ImageHandler:
         """
         self.__image = image
         self.__height, self.__width = image.shape[:2]
+        self.__summed_area_table = None
 
     def process(self, color_level: int, pixel_size: int) -> None:
         """Image processing with information about color depth and pixel size
@@ -46,16 +51,7 @@ class ImageHandler:
 
         self.__check_pixel_size(pixel_size)
 
-        for y in range(0, self.__height, pixel_size):
-            for x in range(0, self.__width, pixel_size):
-                color = self.__get_average_color(y, x, self.__height, self.__width)
-                cv2.rectangle(
-                    self.__image,
-                    (x, y),
-                    (x + self.__side, y + self.__side),
-                    self.__palette[tuple(c // self.__color_coeff for c in color)],
-                    cv2.FILLED,
-                )
+        self.__pixelize_area(0, 0, self.__height, self.__width, self.__palette)
 
     def pixelize(self, pixel_size: int) -> None:
         """Image pixelization with information about pixel size
@@ -65,16 +61,7 @@ class ImageHandler:
         """
         self.__check_pixel_size(pixel_size)
 
-        for y in range(0, self.__height, pixel_size):
-            for x in range(0, self.__width, pixel_size):
-                color = self.__get_average_color(y, x, self.__height, self.__width)
-                cv2.rectangle(
-                    self.__image,
-                    (x, y),
-                    (x + self.__side, y + self.__side),
-                    color,
-                    cv2.FILLED,
-                )
+        self.__pixelize_area(0, 0, self.__height, self.__width)
 
     def pixelize_for_video(self, pixel_size: int) -> None:
         """Image pixelization accelearated for sequentially processing of video frames
@@ -84,17 +71,29 @@ class ImageHandler:
         """
         self.__check_pixel_size(pixel_size)
 
-        pixels = accelerate_pixelization(
-            self.__image, self.__height, self.__width, self.__side
-        )
+        self.__pixelize_area(0, 0, self.__height, self.__width)
+
+    def pixelize_regions(self, pixel_size: int, regions: list) -> None:
+        """Pixelization of image regions with information about pixels size
+
+        Args:
+            pixel_size (int): size of pixels
 
-        for color, (x, y) in pixels:
-            cv2.rectangle(
-                self.__image,
-                (x, y),
-                (x + self.__side, y + self.__side),
-                color,
-                cv2.FILLED,
+            regions (list): regions in (x, y, width, height) format
+        """
+        for x, y, width, height in regions:
+            x_border = min(x + width, self.__width)
+            y_border = min(y + height, self.__height)
+            x, y = max(x, 0), max(y, 0)
+
+            # Pixels can't be bigger than the region itself
+            region_pixel_size = min(pixel_size, x_border - x, y_border - y)
+            if region_pixel_size < 2:
+                continue
+
+            # Handler of the region view computes sums only over the region
+            ImageHandler(self.__image[y:y_border, x:x_border]).pixelize(
+                region_pixel_size
             )
 
     def pixelize_faces(self) -> bool:
@@ -103,6 +102,9 @@ class ImageHandler:
         Returns:
             bool: whether the faces were found in the image
         """
+        # face_recognition loads dlib and its models, so it is imported on first use
+        import face_recognition
+
         faces = face_recognition.face_locations(self.__image)
 
         for top, right, bottom, left in faces:
@@ -115,62 +117,118 @@ class ImageHandler:
             raise pe.InvalidColorLvl
 
         colors, color_coeff = np.linspace(0, 255, color_level, dtype=int, retstep=True)
-        color_palette = [
-            np.array([b, g, r]) for b in colors for g in colors for r in colors
-        ]
-        self.__palette = {}
-        self.__color_coeff = int(color_coeff)
+        color_coeff = int(color_coeff)
+        color_keys = {color // color_coeff: color for color in colors}
 
-        for color in color_palette:
-            color_key = tuple(color // self.__color_coeff)
-            self.__palette[color_key] = tuple(int(x) for x in color)
+        self.__palette = np.array(
+            [color_keys[value // color_coeff] for value in range(256)], dtype=np.uint8
+        )
 
     def __check_pixel_size(self, pixel_size: int) -> None:
         if pixel_size < 2 or pixel_size > self.__width or pixel_size > self.__height:
             raise pe.InvalidPixelSize
         self.__side = pixel_size - 1
 
-    def __get_average_color(self, y: int, x: int, height: int, width: int):
-        y_border = min(y + self.__side, height)
-        x_border = min(x + self.__side, width)
+    def __get_summed_area_table(self) -> np.ndarray:
+        if self.__summed_area_table is None:
+            self.__summed_area_table = summed_area_table(self.__image)
+        return self.__summed_area_table
+
+    def __pixelize_area(
+        self,
+        y: int,
+        x: int,
+        height: int,
+        width: int,
+        palette: Optional[np.ndarray] = None,
+    ) -> None:
+        pixel_size = self.__side + 1
+        y_starts = np.arange(y, y + height, pixel_size)
+        x_starts = np.arange(x, x + width, pixel_size)
+
+        colors = accelerate_pixelization(
+            self.__get_summed_area_table(),
+            y_starts,
+            x_starts,
+            y + height,
+            x + width,
+            self.__side,
+        )
+        colors = np.rint(colors).astype(np.uint8)
+        if palette is not None:
+            colors = palette[colors]
+
+        y_border = min(y + len(y_starts) * pixel_size, self.__height)
+        x_border = min(x + len(x_starts) * pixel_size, self.__width)
+        blocks = colors.repeat(pixel_size, 0).repeat(pixel_size, 1)
 
-        return tuple(np.round(cv2.mean(self.__image[y:y_border, x:x_border])[:3]))
+        self.__image[y:y_border, x:x_border] = blocks[: y_border - y, : x_border - x]
 
     def __pixelize_face(self, x: int, y: int, width: int, height: int) -> None:
         pixel_size = height // 8 if height > 16 else 2
 
         self.__check_pixel_size(pixel_size)
 
-        for y_face in range(y, y + height, pixel_size):
-            for x_face in range(x, x + width, pixel_size):
-                color = self.__get_average_color(y_face, x_face, y + height, x + width)
-                cv2.rectangle(
-                    self.__image,
-                    (x_face, y_face),
-                    (x_face + self.__side, y_face + self.__side),
-                    color,
-                    cv2.FILLED,
-                )
+        self.__pixelize_area(y, x, height, width)
 
 
-@njit(fastmath=True)
-def accelerate_pixelization(image: np.ndarray, height: int, width: int, side: int):
-    pixels = []
+def warm_up() -> None:
+    """Compiles accelerated functions or loads them from the cache,
+    so that the first processed image doesn't wait for the compilation
+    """
+    image = np.zeros((2, 2, 3), dtype=np.uint8)
+    ImageHandler(image).pixelize(2)
 
-    for y in range(0, height, side + 1):
-        for x in range(0, width, side + 1):
-            b, g, r = get_average_color(image, y, x, height, width, side)
-            pixels.append(((b, g, r), (x, y)))
+    # Tables of large images are float, see summed_area_table
+    table = cv2.integral(image, sdepth=cv2.CV_64F)
+    accelerate_pixelization(table, np.arange(0, 2, 2), np.arange(0, 2, 2), 2, 2, 1)
 
-    return pixels
 
+def summed_area_table(image: np.ndarray) -> np.ndarray:
+    """Summed-area table of the image, padded with a zero row and column
 
-@njit(fastmath=True)
-def get_average_color(
-    image: np.ndarray, y: int, x: int, height: int, width: int, side: int
+    Args:
+        image (np.ndarray): numpy array representing image
+
+    Returns:
+        np.ndarray: table, where table[y, x] is the sum of image[:y, :x]
+    """
+    # Sums of 8-bit images up to 8 megapixels fit in 32-bit integers exactly,
+    # which takes half the memory of 64-bit floats needed for larger images
+    if image.shape[0] * image.shape[1] * 255 < 2**31:
+        return cv2.integral(image, sdepth=cv2.CV_32S)
+    return cv2.integral(image, sdepth=cv2.CV_64F)
+
+
+@njit(fastmath=True, cache=True)
+def accelerate_pixelization(
+    table: np.ndarray,
+    y_starts: np.ndarray,
+    x_starts: np.ndarray,
+    y_limit: int,
+    x_limit: int,
+    side: int,
 ):
-    y_border = min(y + side, height)
-    x_border = min(x + side, width)
-    color_sum = np.sum(np.sum(image[y:y_border, x:x_border], 0), 0)
+    colors = np.empty((y_starts.size, x_starts.size, table.shape[2]))
+
+    for i in range(y_starts.size):
+        y = y_starts[i]
+        y_border = min(y + side, y_limit)
+        for j in range(x_starts.size):
+            x = x_starts[j]
+            x_border = min(x + side, x_limit)
+            colors[i, j] = get_average_color(table, y, x, y_border, x_border)
+
+    return colors
+
+
+@njit(fastmath=True, cache=True)
+def get_average_color(table: np.ndarray, y: int, x: int, y_border: int, x_border: int):
+    color_sum = (
+        table[y_border, x_border]
+        - table[y, x_border]
+        - table[y_border, x]
+        + table[y, x]
+    )
 
-    return np.round(color_sum / side**2, 0, color_sum)
+    return color_sum / ((y_border - y) * (x_border - x))
@@ -1,13 +1,12 @@
+import asyncio
 import logging
 from io import BytesIO
 
-import cv2
-import numpy as np
 from telegram import Document, InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 import pixel_exception as pe
-from pixel_image import ImageHandler
+from pixel_queue import TaskQueue, queue_task
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -84,22 +83,46 @@ async def process(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.message.from_user
 
     if isinstance(update.message.effective_attachment, Document):
-        image_file = await update.message.effective_attachment.get_file()
+        attachment = update.message.effective_attachment
     else:
-        image_file = await update.message.photo[-1].get_file()
-
-    image = await image_file.download_as_bytearray()
-    image = cv2.imdecode(np.asarray(image), cv2.IMREAD_COLOR)
-    logger.info("Received image for image processing, User %s", user.name)
+        attachment = update.message.photo[-1]
 
     color_level_image = context.user_data["color_level_image"]
     pixel_size_image = context.user_data["pixel_size_image"]
 
+    if queue_task(
+        update,
+        TaskQueue.IMAGE,
+        attachment.file_id,
+        color_level=color_level_image,
+        pixel_size=pixel_size_image,
+    ):
+        logger.info("Queued image for image processing, User %s", user.name)
+        await update.message.reply_text(
+            "Изображение обрабатывается, пожалуйста подождите..."
+        )
+
+        return ConversationHandler.END
+
+    # Processing dependencies are heavy, so they are loaded on first use
+    import cv2
+    import numpy as np
+
+    from pixel_image import ImageHandler
+
+    image_file = await attachment.get_file()
+    image = BytesIO()
+    await image_file.download_to_memory(image)
+    image = cv2.imdecode(np.frombuffer(image.getbuffer(), np.uint8), cv2.IMREAD_COLOR)
+    logger.info("Received image for image processing, User %s", user.name)
+
     try:
         if color_level_image != 256:
-            ImageHandler(image).process(color_level_image, pixel_size_image)
+            await asyncio.to_thread(
+                ImageHandler(image).process, color_level_image, pixel_size_image
+            )
         else:
-            ImageHandler(image).pixelize(pixel_size_image)
+            await asyncio.to_thread(ImageHandler(image).pixelize, pixel_size_image)
 
     except pe.InvalidPixelSize as exception:
         logger.warning("In image processing: %s, User %s", exception.message, user.name)
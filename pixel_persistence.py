@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Persistence of users data and conversation states in SQLite database,
+    shared by all processes of the bot
+
+    Changes are collected in memory and written to the database in one transaction
+    every flush_interval seconds
+
+    Methods
+    -------
+    get_user_data()
+        Returns users data saved in database
+
+    get_conversations(name: str)
+        Returns conversation states saved in database
+    """
+
+    def __init__(
+        self, path: str, update_interval: float = 60, flush_interval: float = 1
+    ) -> None:
+        """
+        Args:
+            path (str): path of the database file
+
+            update_interval (float): interval in seconds between updates of persistence
+
+            flush_interval (float): interval in seconds between writes to database
+        """
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self.__flush_interval = flush_interval
+        self.__write_task = None
+        self.__write_lock = asyncio.Lock()
+        self.__pending_user_data = {}
+        self.__pending_conversations = {}
+
+        self.__connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.__connection.executescript(
+            "PRAGMA journal_mode = WAL;"
+            "PRAGMA synchronous = NORMAL;"
+            "CREATE TABLE IF NOT EXISTS user_data ("
+            "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "name TEXT NOT NULL, key TEXT NOT NULL, state INTEGER, "
+            "PRIMARY KEY (name, key));"
+        )
+        self.__connection.commit()
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        """Returns users data saved in database"""
+        rows = self.__connection.execute("SELECT user_id, data FROM user_data")
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[int, ...], object]:
+        """Returns conversation states saved in database
+
+        Args:
+            name (str): name of the conversation handler
+        """
+        rows = self.__connection.execute(
+            "SELECT key, state FROM conversations WHERE name = ?", (name,)
+        )
+        return {tuple(json.loads(key)): state for key, state in rows}
+
+    async def update_conversation(
+        self, name: str, key: Tuple[int, ...], new_state: Optional[object]
+    ) -> None:
+        self.__pending_conversations[(name, json.dumps(key))] = new_state
+        self.__schedule_write()
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self.__pending_user_data[user_id] = json.dumps(data)
+        self.__schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data: object) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self.__pending_user_data[user_id] = None
+        self.__schedule_write()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        row = self.__connection.execute(
+            "SELECT data FROM user_data WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return
+
+        # Data in memory is newer, because it's written to database only
+        # every update_interval seconds, so only missing keys are filled
+        for key, value in json.loads(row[0]).items():
+            user_data.setdefault(key, value)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self.__write_task is not None:
+            # The task is still sleeping, pending changes are written right now
+            self.__write_task.cancel()
+            self.__write_task = None
+        await self.__write_pending()
+        self.__connection.close()
+
+    def __schedule_write(self) -> None:
+        if self.__write_task is None:
+            self.__write_task = asyncio.create_task(self.__write_later())
+
+    async def __write_later(self) -> None:
+        await asyncio.sleep(self.__flush_interval)
+        self.__write_task = None
+        try:
+            await self.__write_pending()
+        except sqlite3.Error as error:
+            logger.warning("Changes were not written to database: %s", error)
+            self.__schedule_write()
+
+    async def __write_pending(self) -> None:
+        user_data, self.__pending_user_data = self.__pending_user_data, {}
+        conversations, self.__pending_conversations = self.__pending_conversations, {}
+
+        # Database can be locked by another process, so the event loop doesn't wait
+        async with self.__write_lock:
+            try:
+                await asyncio.to_thread(self.__write, user_data, conversations)
+            except sqlite3.Error:
+                # Changes made during the write are newer than the batch
+                for user_id, data in user_data.items():
+                    self.__pending_user_data.setdefault(user_id, data)
+                for key, state in conversations.items():
+                    self.__pending_conversations.setdefault(key, state)
+                raise
+
+    def __write(self, user_data: dict, conversations: dict) -> None:
+        with self.__connection:
+            self.__connection.executemany(
+                "DELETE FROM user_data WHERE user_id = ?",
+                [(user_id,) for user_id, data in user_data.items() if data is None],
+            )
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO user_data VALUES (?, ?)",
+                [
+                    (user_id, data)
+                    for user_id, data in user_data.items()
+                    if data is not None
+                ],
+            )
+            self.__connection.executemany(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                [key for key, state in conversations.items() if state is None],
+            )
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)",
+                [
+                    (*key, state)
+                    for key, state in conversations.items()
+                    if state is not None
+                ],
+            )
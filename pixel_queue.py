@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+from telegram import Update
+
+# Regions of video pixelization task, which are found by motion detection
+MOTION = "motion"
+
+
+class TaskQueue:
+    """Queue of processing tasks in SQLite database, shared by the bot and workers
+
+    Methods
+    -------
+    put(kind: str, payload: dict)
+        Adds task to the queue
+
+    take(worker: str)
+        Takes the oldest waiting task from the queue,
+        tasks not finished in claim_timeout seconds are taken again
+
+    done(task_id: int)
+        Removes finished task from the queue
+
+    failed(task_id: int)
+        Marks task as failed
+    """
+
+    IMAGE, IMAGE_FACES, VIDEO, VIDEO_FACES = (
+        "image",
+        "image_faces",
+        "video",
+        "video_faces",
+    )
+
+    WAITING, TAKEN, FAILED = range(3)
+
+    def __init__(self, path: str, claim_timeout: float = 3600) -> None:
+        """
+        Args:
+            path (str): path of the database file
+
+            claim_timeout (float): time in seconds, after which the task taken
+                by crashed worker is returned to the queue
+        """
+        self.__claim_timeout = claim_timeout
+        self.__connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.__connection.executescript(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, "
+            "payload TEXT NOT NULL, status INTEGER NOT NULL, worker TEXT, "
+            "created REAL NOT NULL, taken REAL);"
+        )
+        self.__connection.commit()
+
+    def put(self, kind: str, payload: dict) -> int:
+        """Adds task to the queue
+
+        Args:
+            kind (str): kind of the task
+
+            payload (dict): parameters of the task
+
+        Returns:
+            int: id of the task
+        """
+        with self.__connection:
+            cursor = self.__connection.execute(
+                "INSERT INTO tasks (kind, payload, status, created) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), self.WAITING, time.time()),
+            )
+        return cursor.lastrowid
+
+    def take(self, worker: str) -> Optional[Tuple[int, str, dict]]:
+        """Takes the oldest waiting task from the queue,
+        tasks not finished in claim_timeout seconds are taken again
+
+        Args:
+            worker (str): name of the worker taking the task
+
+        Returns:
+            Optional[Tuple[int, str, dict]]: id, kind and payload of the task,
+                or None if the queue is empty
+        """
+        now = time.time()
+        with self.__connection:
+            row = self.__connection.execute(
+                "UPDATE tasks SET status = ?, worker = ?, taken = ? WHERE id = ("
+                "SELECT id FROM tasks WHERE status = ? OR (status = ? AND taken < ?) "
+                "ORDER BY id LIMIT 1) "
+                "RETURNING id, kind, payload",
+                (
+                    self.TAKEN,
+                    worker,
+                    now,
+                    self.WAITING,
+                    self.TAKEN,
+                    now - self.__claim_timeout,
+                ),
+            ).fetchone()
+        if row is None:
+            return None
+
+        task_id, kind, payload = row
+        return task_id, kind, json.loads(payload)
+
+    def done(self, task_id: int) -> None:
+        """Removes finished task from the queue
+
+        Args:
+            task_id (int): id of the task
+        """
+        with self.__connection:
+            self.__connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def failed(self, task_id: int) -> None:
+        """Marks task as failed
+
+        Args:
+            task_id (int): id of the task
+        """
+        with self.__connection:
+            self.__connection.execute(
+                "UPDATE tasks SET status = ? WHERE id = ?", (self.FAILED, task_id)
+            )
+
+
+_task_queue = None
+
+
+def get_task_queue() -> Optional[TaskQueue]:
+    """Returns task queue, if the bot is deployed with workers
+
+    Returns:
+        Optional[TaskQueue]: queue from TASK_QUEUE environment variable, or None
+    """
+    global _task_queue
+
+    path = os.getenv("TASK_QUEUE")
+    if path is not None and _task_queue is None:
+        _task_queue = TaskQueue(path)
+    return _task_queue
+
+
+def queue_task(update: Update, kind: str, file_id: str, **parameters) -> bool:
+    """Puts processing of the file to the task queue,
+    if the bot is deployed with workers
+
+    Args:
+        update (Update): update with the file
+
+        kind (str): kind of the task
+
+        file_id (str): id of the file
+
+        **parameters: parameters of the processing
+
+    Returns:
+        bool: whether the task was queued
+    """
+    task_queue = get_task_queue()
+    if task_queue is None:
+        return False
+
+    task_queue.put(
+        kind,
+        {
+            "chat_id": update.message.chat_id,
+            "message_id": update.message.message_id,
+            "file_id": file_id,
+            "user": update.message.from_user.name,
+            **parameters,
+        },
+    )
+    return True
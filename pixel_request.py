@@ -0,0 +1,30 @@
+from importlib.util import find_spec
+
+from telegram.request import HTTPXRequest
+
+MEDIA_CONNECTION_POOL_SIZE = 64
+MEDIA_CONNECT_TIMEOUT = 10.0
+MEDIA_READ_TIMEOUT = 60.0
+MEDIA_WRITE_TIMEOUT = 60.0
+MEDIA_POOL_TIMEOUT = 10.0
+
+# HTTP/2 requires httpx[http2] extra, HTTP/1.1 is used without it
+HTTP_VERSION = "2" if find_spec("h2") is not None else "1.1"
+
+
+def create_media_request() -> HTTPXRequest:
+    """Creates request for Bot API calls, which transfer media files
+
+    Returns:
+        HTTPXRequest: request with pooled connections and long timeouts for media
+    """
+    # Media downloads and uploads share one pooled client, so transfers of
+    # different users don't wait for a free connection
+    return HTTPXRequest(
+        connection_pool_size=MEDIA_CONNECTION_POOL_SIZE,
+        connect_timeout=MEDIA_CONNECT_TIMEOUT,
+        read_timeout=MEDIA_READ_TIMEOUT,
+        write_timeout=MEDIA_WRITE_TIMEOUT,
+        pool_timeout=MEDIA_POOL_TIMEOUT,
+        http_version=HTTP_VERSION,
+    )
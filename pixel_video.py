@@ -1,10 +1,20 @@
 import subprocess as sp
 import os
+import shutil
 
 import cv2
 import multiprocess as mp
 
-from pixel_image import ImageHandler
+from pixel_image import ImageHandler, warm_up
+
+# Pool workers are forked from a separate single-threaded server, so they don't
+# inherit locks held by other threads of the bot, e.g. the numba compiler lock.
+# The server preloads heavy modules once, so workers don't import them again
+pool_context = mp.get_context("forkserver")
+pool_context.set_forkserver_preload(["pixel_image", "face_recognition"])
+
+# Moving objects with smaller area are considered noise
+MIN_MOTION_AREA = 64
 
 
 class VideoHandler:
@@ -15,6 +25,12 @@ class VideoHandler:
     pixelize(pixel_size: int)
         Video pixelization with information about pixels size
 
+    pixelize_regions(pixel_size: int, regions: list)
+        Pixelization of video regions with information about pixels size
+
+    pixelize_motion(pixel_size: int)
+        Pixelization of moving objects in video with information about pixels size
+
     anonymize()
         Video anonymization
 
@@ -22,7 +38,7 @@ class VideoHandler:
         Returns, whether the faces were found while video anonymization
     """
 
-    PIXELIZE, ANONYMIZE = range(2)
+    PIXELIZE, ANONYMIZE, PIXELIZE_REGIONS = range(3)
 
     def __init__(self, path: str) -> None:
         """
@@ -47,7 +63,7 @@ class VideoHandler:
         self.__fourcc = cv2.VideoWriter_fourcc(*"mp4v")
         cap.release()
 
-        self.__are_faces_found = mp.Manager().Value(bool, False)
+        self.__are_faces_found = False
 
     def pixelize(self, pixel_size: int) -> str:
         """Video pixelization with information about pixels size
@@ -61,6 +77,34 @@ class VideoHandler:
         self.__pixel_size = pixel_size
         return self.__process(self.PIXELIZE)
 
+    def pixelize_regions(self, pixel_size: int, regions: list) -> str:
+        """Pixelization of video regions with information about pixels size
+
+        Args:
+            pixel_size (int): size of pixels
+
+            regions (list): regions in (x, y, width, height) format
+
+        Returns:
+            str: path of the result video
+        """
+        self.__pixel_size = pixel_size
+        self.__regions = regions
+        return self.__process(self.PIXELIZE_REGIONS)
+
+    def pixelize_motion(self, pixel_size: int) -> str:
+        """Pixelization of moving objects in video with information about pixels size
+
+        Args:
+            pixel_size (int): size of pixels
+
+        Returns:
+            str: path of the result video
+        """
+        self.__pixel_size = pixel_size
+        self.__regions = None
+        return self.__process(self.PIXELIZE_REGIONS)
+
     def anonymize(self) -> str:
         """Video anonymization
 
@@ -71,7 +115,7 @@ class VideoHandler:
 
     def faces_not_found(self) -> bool:
         """Return whether the faces were found while video anonymization"""
-        return not self.__are_faces_found.value
+        return not self.__are_faces_found
 
     def __init_num_processes(self) -> None:
         self.__num_processes = 4
@@ -83,7 +127,18 @@ class VideoHandler:
         ffmpeg_cmd = f"ffmpeg -y -loglevel error -i {self.__path} {self.__audio_file}"
         sp.Popen(ffmpeg_cmd).wait()
 
-    def __pixelize_video_part(self, part_number: int) -> None:
+    def __process_video_part(self, part_number: int, process_frame) -> bool:
+        """Processes frames of the video part and writes them to the part file
+
+        Args:
+            part_number (int): number of the video part
+
+            process_frame (Callable[[np.ndarray], Optional[bool]]): processing
+                of the frame in place
+
+        Returns:
+            bool: whether process_frame returned True for any frame
+        """
         cap = cv2.VideoCapture(self.__path)
         cap.set(cv2.CAP_PROP_POS_FRAMES, self.__frame_shift * part_number)
 
@@ -96,49 +151,50 @@ class VideoHandler:
         part_end = self.__frame_shift
         if part_number == self.__num_processes - 1:
             part_end = self.__frame_count - self.__frame_shift * part_number
+
+        is_processed = False
         for _ in range(part_end):
             ret, frame = cap.read()
             if not ret:
                 break
 
-            ImageHandler(frame).pixelize_for_video(self.__pixel_size)
+            if process_frame(frame):
+                is_processed = True
 
             out.write(frame)
 
         cap.release()
         out.release()
 
-    def __anonymize_video_part(self, part_number: int) -> None:
-        cap = cv2.VideoCapture(self.__path)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, self.__frame_shift * part_number)
+        return is_processed
 
-        out = cv2.VideoWriter(
-            f"{self.__dir_name}/part_{part_number}.mp4",
-            self.__fourcc,
-            self.__fps,
-            (self.__width, self.__height),
-        )
-        part_end = self.__frame_shift
-        if part_number == self.__num_processes - 1:
-            part_end = self.__frame_count - self.__frame_shift * part_number
+    def __pixelize_video_part(self, part_number: int) -> None:
+        def pixelize(frame) -> None:
+            ImageHandler(frame).pixelize_for_video(self.__pixel_size)
 
-        are_faces_found = False
-        for _ in range(part_end):
-            ret, frame = cap.read()
-            if not ret:
-                break
+        self.__process_video_part(part_number, pixelize)
 
-            are_faces_found_in_frame = ImageHandler(frame).pixelize_faces()
-            if not are_faces_found and are_faces_found_in_frame:
-                are_faces_found = True
+    def __pixelize_regions_video_part(self, part_number: int) -> None:
+        if self.__regions is None:
+            # Every part learns the background from its own frames
+            background_subtractor = cv2.createBackgroundSubtractorMOG2()
 
-            out.write(frame)
+            def pixelize(frame) -> None:
+                regions = get_motion_regions(background_subtractor, frame)
+                ImageHandler(frame).pixelize_regions(self.__pixel_size, regions)
 
-        if not self.__are_faces_found.value and are_faces_found:
-            self.__are_faces_found.value = True
+        else:
 
-        cap.release()
-        out.release()
+            def pixelize(frame) -> None:
+                ImageHandler(frame).pixelize_regions(self.__pixel_size, self.__regions)
+
+        self.__process_video_part(part_number, pixelize)
+
+    def __anonymize_video_part(self, part_number: int) -> bool:
+        def anonymize(frame) -> bool:
+            return ImageHandler(frame).pixelize_faces()
+
+        return self.__process_video_part(part_number, anonymize)
 
     def __combine_video_parts(self) -> None:
         self.__video_parts = [f"part_{i}.mp4" for i in range(self.__num_processes)]
@@ -167,25 +223,60 @@ class VideoHandler:
 
     def __process(self, mode) -> str:
         os.mkdir(self.__dir_name)
-        self.__audio_file = f"{self.__dir_name}/audio.wav"
-        self.__extract_audio()
-
-        pool = mp.Pool(self.__num_processes)
-        match mode:
-            case self.PIXELIZE:
-                pool.map(self.__pixelize_video_part, range(self.__num_processes))
-            case self.ANONYMIZE:
-                pool.map(self.__anonymize_video_part, range(self.__num_processes))
-        pool.close()
-        pool.join()
-
-        self.__combine_video_parts()
-        for f in self.__video_parts:
-            os.remove(f"{self.__dir_name}/{f}")
-
-        self.__add_audio_to_video()
-        os.remove(self.__video_without_audio_file)
-        os.remove(self.__audio_file)
-        os.rmdir(self.__dir_name)
+        try:
+            self.__audio_file = f"{self.__dir_name}/audio.wav"
+            self.__extract_audio()
+
+            with pool_context.Pool(self.__num_processes, initializer=warm_up) as pool:
+                match mode:
+                    case self.PIXELIZE:
+                        pool.map(
+                            self.__pixelize_video_part, range(self.__num_processes)
+                        )
+                    case self.PIXELIZE_REGIONS:
+                        pool.map(
+                            self.__pixelize_regions_video_part,
+                            range(self.__num_processes),
+                        )
+                    case self.ANONYMIZE:
+                        # Each part reports its own result,
+                        # so workers don't share any state
+                        self.__are_faces_found = any(
+                            pool.map(
+                                self.__anonymize_video_part,
+                                range(self.__num_processes),
+                            )
+                        )
+
+            self.__combine_video_parts()
+            self.__add_audio_to_video()
+        finally:
+            # Temporary files are removed even if processing failed
+            shutil.rmtree(self.__dir_name, ignore_errors=True)
 
         return self.__result_video
+
+
+def get_motion_regions(background_subtractor, frame) -> list:
+    """Returns regions of moving objects in the frame
+
+    Args:
+        background_subtractor (cv2.BackgroundSubtractor): model of the background,
+            updated with every frame
+
+        frame (np.ndarray): next frame of the video
+
+    Returns:
+        list: regions in (x, y, width, height) format
+    """
+    mask = background_subtractor.apply(frame)
+    # Shadows are marked with gray in the mask, only moving objects are kept
+    _, mask = cv2.threshold(mask, 254, 255, cv2.THRESH_BINARY)
+    mask = cv2.dilate(mask, None, iterations=2)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [
+        cv2.boundingRect(contour)
+        for contour in contours
+        if cv2.contourArea(contour) >= MIN_MOTION_AREA
+    ]
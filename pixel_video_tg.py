@@ -1,18 +1,29 @@
+import asyncio
 import logging
 import os
+from typing import Optional
+from uuid import uuid4
 
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 import pixel_exception as pe
-from pixel_video import VideoHandler
+from pixel_queue import MOTION, TaskQueue, queue_task
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
-PIXEL_SIZE, PROCESS_VIDEO = range(2)
+PIXEL_SIZE, REGIONS, PROCESS_VIDEO = range(3)
+
+ALL_FRAME, MOVING_OBJECTS = "all", "moving"
+
+regions_keyboard = [
+    [InlineKeyboardButton("Всё видео", callback_data=ALL_FRAME)],
+    [InlineKeyboardButton("Движущиеся объекты", callback_data=MOVING_OBJECTS)],
+]
+regions_kbd_markup = InlineKeyboardMarkup(regions_keyboard)
 
 
 async def video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -43,6 +54,49 @@ async def pixel_size(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["pixel_size_video"] = int(text)
     logger.info("Received pizel size for video pixelization, User %s", user.name)
 
+    await update.message.reply_text(
+        "Выберите, что нужно пикселизировать, "
+        "или отправьте области видео в формате: x y ширина высота, "
+        "каждую с новой строки.",
+        reply_markup=regions_kbd_markup,
+    )
+
+    return REGIONS
+
+
+async def regions_choice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+
+    await query.answer()
+
+    context.user_data["regions_video"] = None if query.data == ALL_FRAME else MOTION
+    logger.info(
+        "Received regions for video pixelization, User %s", query.from_user.name
+    )
+
+    await query.message.reply_text("Отправьте видео для пикелизации.")
+
+    return PROCESS_VIDEO
+
+
+async def regions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    user = update.message.from_user
+
+    regions_video = parse_regions(update.message.text)
+    if regions_video is None:
+        logger.warning(
+            "In video pixelization: %s, User %s",
+            pe.InvalidRegions().message,
+            user.name,
+        )
+        await update.message.reply_text(
+            "Области заданы неверно!\nВведите корректные значения."
+        )
+        return REGIONS
+
+    context.user_data["regions_video"] = regions_video
+    logger.info("Received regions for video pixelization, User %s", user.name)
+
     await update.message.reply_text("Отправьте видео для пикелизации.")
 
     return PROCESS_VIDEO
@@ -51,9 +105,28 @@ async def pixel_size(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def process_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.message.from_user
 
+    pixel_size_video = context.user_data["pixel_size_video"]
+    regions_video = context.user_data.get("regions_video")
+
+    if queue_task(
+        update,
+        TaskQueue.VIDEO,
+        update.message.effective_attachment.file_id,
+        pixel_size=pixel_size_video,
+        regions=regions_video,
+    ):
+        logger.info("Queued video for video pixelization, User %s", user.name)
+        await update.message.reply_text("Видео обрабатывается, пожалуйста подождите...")
+
+        return ConversationHandler.END
+
+    # Processing dependencies are heavy, so they are loaded on first use
+    from pixel_video import VideoHandler
+
     video_file = await update.message.effective_attachment.get_file()
+    # The same video can be sent by several users at once
     file_id = video_file.file_unique_id
-    video = f"download/{file_id}.mp4"
+    video = f"download/{file_id}_{uuid4().hex}.mp4"
     await video_file.download_to_drive(video)
     logger.info("Received video for video pixelization, User %s", user.name)
 
@@ -61,8 +134,17 @@ async def process_video(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         "Видео обрабатывается, пожалуйста подождите..."
     )
 
-    pixel_size_video = context.user_data["pixel_size_video"]
-    pixelized_video = VideoHandler(video).pixelize(pixel_size_video)
+    handler = await asyncio.to_thread(VideoHandler, video)
+    if regions_video is None:
+        pixelized_video = await asyncio.to_thread(handler.pixelize, pixel_size_video)
+    elif regions_video == MOTION:
+        pixelized_video = await asyncio.to_thread(
+            handler.pixelize_motion, pixel_size_video
+        )
+    else:
+        pixelized_video = await asyncio.to_thread(
+            handler.pixelize_regions, pixel_size_video, regions_video
+        )
 
     with open(pixelized_video, "rb") as result:
         await context.bot.delete_message(reply.chat_id, reply.message_id)
@@ -91,3 +173,26 @@ async def cancel_required(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "отмените пикселизацию видео "
         "с помощью команды /cancel."
     )
+
+
+def parse_regions(text: str) -> Optional[list]:
+    """Parses video regions, each on a new line in "x y width height" format
+
+    Args:
+        text (str): text of the message
+
+    Returns:
+        Optional[list]: regions in (x, y, width, height) format,
+            or None if the regions are invalid
+    """
+    regions = [line.split() for line in text.splitlines() if line.strip()]
+    if not regions or not all(
+        len(region) == 4
+        and all(value.isdecimal() for value in region)
+        and int(region[2]) > 0
+        and int(region[3]) > 0
+        for region in regions
+    ):
+        return None
+
+    return [[int(value) for value in region] for region in regions]
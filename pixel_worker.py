@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import socket
+from io import BytesIO
+from uuid import uuid4
+
+import cv2
+import multiprocess as mp
+import numpy as np
+from dotenv import load_dotenv
+from telegram import Bot
+from telegram.error import TelegramError
+
+import pixel_exception as pe
+from pixel_image import ImageHandler, warm_up
+from pixel_queue import MOTION, TaskQueue, get_task_queue
+from pixel_request import create_media_request
+from pixel_video import VideoHandler
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.5
+
+
+async def process_image(bot: Bot, kind: str, task: dict) -> None:
+    image_file = await bot.get_file(task["file_id"])
+    image = BytesIO()
+    await image_file.download_to_memory(image)
+    image = cv2.imdecode(np.frombuffer(image.getbuffer(), np.uint8), cv2.IMREAD_COLOR)
+    logger.info("Received image for %s task, User %s", kind, task["user"])
+
+    if kind == TaskQueue.IMAGE_FACES:
+        if not await asyncio.to_thread(ImageHandler(image).pixelize_faces):
+            await bot.send_message(
+                task["chat_id"],
+                "Лица не найдены.",
+                reply_to_message_id=task["message_id"],
+            )
+            logger.warning("Faces were not found in image, User %s", task["user"])
+            return
+    else:
+        try:
+            if task["color_level"] != 256:
+                await asyncio.to_thread(
+                    ImageHandler(image).process,
+                    task["color_level"],
+                    task["pixel_size"],
+                )
+            else:
+                await asyncio.to_thread(
+                    ImageHandler(image).pixelize, task["pixel_size"]
+                )
+
+        except pe.InvalidPixelSize as exception:
+            logger.warning(
+                "In image processing: %s, User %s", exception.message, task["user"]
+            )
+            await bot.send_message(
+                task["chat_id"],
+                "Размер пикселей задан неверно!\n"
+                "Начните заново с помощью команды /image.",
+                reply_to_message_id=task["message_id"],
+            )
+            return
+
+    _, buffer = cv2.imencode(".jpg", image)
+    await bot.send_photo(
+        task["chat_id"], BytesIO(buffer), reply_to_message_id=task["message_id"]
+    )
+    logger.info("Processed image sended, User %s", task["user"])
+
+
+async def process_video(bot: Bot, kind: str, task: dict) -> None:
+    video_file = await bot.get_file(task["file_id"])
+    # The same video can be processed by several workers at once
+    video = f"download/{video_file.file_unique_id}_{uuid4().hex}.mp4"
+    processed_video = None
+    try:
+        await video_file.download_to_drive(video)
+        logger.info("Received video for %s task, User %s", kind, task["user"])
+
+        handler = await asyncio.to_thread(VideoHandler, video)
+        if kind == TaskQueue.VIDEO_FACES:
+            processed_video = await asyncio.to_thread(handler.anonymize)
+        elif task["regions"] is None:
+            processed_video = await asyncio.to_thread(
+                handler.pixelize, task["pixel_size"]
+            )
+        elif task["regions"] == MOTION:
+            processed_video = await asyncio.to_thread(
+                handler.pixelize_motion, task["pixel_size"]
+            )
+        else:
+            processed_video = await asyncio.to_thread(
+                handler.pixelize_regions, task["pixel_size"], task["regions"]
+            )
+
+        if kind == TaskQueue.VIDEO_FACES and handler.faces_not_found():
+            await bot.send_message(
+                task["chat_id"],
+                "Лица не найдены.",
+                reply_to_message_id=task["message_id"],
+            )
+            logger.warning("Faces were not found in video, User %s", task["user"])
+        else:
+            with open(processed_video, "rb") as result:
+                await bot.send_video(
+                    task["chat_id"], result, reply_to_message_id=task["message_id"]
+                )
+                logger.info("Processed video sended, User %s", task["user"])
+    finally:
+        # Files are removed even if processing or sending failed
+        for path in (video, processed_video):
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+
+async def send_error(bot: Bot, task: dict, exception: Exception) -> None:
+    reply = pe.error_reply(exception)
+    if reply is None:
+        reply = "Не удалось обработать файл, попробуйте ещё раз."
+
+    try:
+        await bot.send_message(
+            task["chat_id"], reply, reply_to_message_id=task["message_id"]
+        )
+    except TelegramError as error:
+        logger.error("Error reply was not sended: %s, User %s", error, task["user"])
+
+
+async def work(name: str) -> None:
+    """Takes tasks from the queue and sends results to users, until interrupted
+
+    Args:
+        name (str): name of the worker
+    """
+    task_queue = get_task_queue()
+    bot = Bot(os.getenv("TOKEN"), request=create_media_request())
+
+    async with bot:
+        while True:
+            task = task_queue.take(name)
+            if task is None:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+
+            task_id, kind, payload = task
+            try:
+                match kind:
+                    case TaskQueue.IMAGE | TaskQueue.IMAGE_FACES:
+                        await process_image(bot, kind, payload)
+                    case TaskQueue.VIDEO | TaskQueue.VIDEO_FACES:
+                        await process_video(bot, kind, payload)
+            except Exception as exception:
+                logger.exception("Task %d failed, User %s", task_id, payload["user"])
+                task_queue.failed(task_id)
+                await send_error(bot, payload, exception)
+            else:
+                task_queue.done(task_id)
+
+
+def run_worker(number: int) -> None:
+    warm_up()
+    try:
+        asyncio.run(work(f"{socket.gethostname()}:{os.getpid()}:{number}"))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    if not os.path.isdir("download"):
+        os.mkdir("download")
+
+    load_dotenv()
+    if os.getenv("TASK_QUEUE") is None:
+        raise SystemExit("TASK_QUEUE is not set")
+
+    workers = [
+        mp.Process(target=run_worker, args=(number,))
+        for number in range(int(os.getenv("WORKERS", "1")))
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
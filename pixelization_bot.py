@@ -4,7 +4,6 @@ from warnings import filterwarnings
 
 from dotenv import load_dotenv
 from telegram import Update
-from telegram.error import TelegramError
 from telegram.ext import (
     ApplicationBuilder,
     CallbackQueryHandler,
@@ -14,11 +13,16 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
+from telegram.request import HTTPXRequest
 from telegram.warnings import PTBUserWarning
 
+import pixel_exception as pe
 import pixel_face_tg as pixel_face
 import pixel_image_tg as pixel_image
 import pixel_video_tg as pixel_video
+from pixel_persistence import SQLitePersistence
+from pixel_queue import get_task_queue
+from pixel_request import HTTP_VERSION, create_media_request
 
 filterwarnings(
     action="ignore", message=r".*CallbackQueryHandler", category=PTBUserWarning
@@ -48,12 +52,9 @@ async def unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def error(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.error(context.error)
-    if isinstance(context.error, TelegramError):
-        match context.error.message:
-            case "File is too big":
-                await update.message.reply_text(
-                    "Файл слишком большой!\nМаксимальный размер файла равен 20 МБ"
-                )
+    reply = pe.error_reply(context.error)
+    if reply is not None:
+        await update.message.reply_text(reply)
 
 
 if __name__ == "__main__":
@@ -61,10 +62,34 @@ if __name__ == "__main__":
         os.mkdir("download")
 
     load_dotenv()
-    TOKEN = os.getenv("TOKEN")
-    application = ApplicationBuilder().token(TOKEN).build()
+    # Images and videos are processed by workers, if the bot is deployed with them.
+    # Without warm-up the bot starts faster, but the first image waits for numba
+    if get_task_queue() is None and os.getenv("WARM_UP", "1") != "0":
+        from pixel_image import warm_up
+
+        warm_up()
 
+    TOKEN = os.getenv("TOKEN")
+    application_builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .request(create_media_request())
+        .get_updates_request(HTTPXRequest(http_version=HTTP_VERSION))
+    )
+    # Conversations are kept in the shared database,
+    # so the bot can be restarted or moved without losing them
+    PERSISTENCE = os.getenv("PERSISTENCE")
+    if PERSISTENCE is not None:
+        application_builder.persistence(SQLitePersistence(PERSISTENCE))
+    application = application_builder.build()
+    persistent = PERSISTENCE is not None
+
+    # Processing handlers don't block the application, so files of other users are
+    # transferred meanwhile. Updates themselves are still handled one by one,
+    # as required by ConversationHandler
     pixel_image_conversation_handler = ConversationHandler(
+        name="pixel_image",
+        persistent=persistent,
         entry_points=[CommandHandler("image", pixel_image.frame)],
         states={
             pixel_image.COLOR_LEVEL: [CallbackQueryHandler(pixel_image.color_level)],
@@ -73,7 +98,9 @@ if __name__ == "__main__":
             ],
             pixel_image.PROCESS_IMAGE: [
                 MessageHandler(
-                    filters.PHOTO | filters.Document.IMAGE, pixel_image.process
+                    filters.PHOTO | filters.Document.IMAGE,
+                    pixel_image.process,
+                    block=False,
                 )
             ],
         },
@@ -84,13 +111,19 @@ if __name__ == "__main__":
     )
 
     pixel_video_conversation_handler = ConversationHandler(
+        name="pixel_video",
+        persistent=persistent,
         entry_points=[CommandHandler("video", pixel_video.video)],
         states={
             pixel_video.PIXEL_SIZE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, pixel_video.pixel_size)
             ],
+            pixel_video.REGIONS: [
+                CallbackQueryHandler(pixel_video.regions_choice),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, pixel_video.regions),
+            ],
             pixel_video.PROCESS_VIDEO: [
-                MessageHandler(filters.VIDEO, pixel_video.process_video)
+                MessageHandler(filters.VIDEO, pixel_video.process_video, block=False)
             ],
         },
         fallbacks=[
@@ -100,13 +133,17 @@ if __name__ == "__main__":
     )
 
     anonymization_conversation_handler = ConversationHandler(
+        name="pixel_face",
+        persistent=persistent,
         entry_points=[CommandHandler("face", pixel_face.face)],
         states={
             pixel_face.ANONYMIZATION: [
                 MessageHandler(
-                    filters.PHOTO | filters.Document.IMAGE, pixel_face.anonymize_image
+                    filters.PHOTO | filters.Document.IMAGE,
+                    pixel_face.anonymize_image,
+                    block=False,
                 ),
-                MessageHandler(filters.VIDEO, pixel_face.anonymize_video),
+                MessageHandler(filters.VIDEO, pixel_face.anonymize_video, block=False),
             ]
         },
         fallbacks=[
@@ -123,4 +160,14 @@ if __name__ == "__main__":
 
     application.add_error_handler(error)
 
-    application.run_polling()
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    if WEBHOOK_URL is not None:
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            url_path=os.getenv("WEBHOOK_PATH", ""),
+            webhook_url=WEBHOOK_URL,
+            secret_token=os.getenv("WEBHOOK_SECRET"),
+        )
+    else:
+        application.run_polling()
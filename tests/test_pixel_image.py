@@ -0,0 +1,166 @@
+import sys
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+from pixel_image import ImageHandler
+
+# Baseline implementation, which averaged every block separately
+
+
+def baseline_average_color(image, y, x, y_limit, x_limit, side):
+    y_border = min(y + side, y_limit)
+    x_border = min(x + side, x_limit)
+    return tuple(np.round(cv2.mean(image[y:y_border, x:x_border])[:3]))
+
+
+def baseline_pixelize_area(image, y, x, height, width, pixel_size, palette=None):
+    side = pixel_size - 1
+    for y_block in range(y, y + height, pixel_size):
+        for x_block in range(x, x + width, pixel_size):
+            color = baseline_average_color(
+                image, y_block, x_block, y + height, x + width, side
+            )
+            if palette is not None:
+                color = palette(color)
+            cv2.rectangle(
+                image,
+                (x_block, y_block),
+                (x_block + side, y_block + side),
+                color,
+                cv2.FILLED,
+            )
+
+
+def baseline_palette(color_level):
+    colors, color_coeff = np.linspace(0, 255, color_level, dtype=int, retstep=True)
+    color_coeff = int(color_coeff)
+    palette = {}
+    for color in [np.array([b, g, r]) for b in colors for g in colors for r in colors]:
+        palette[tuple(color // color_coeff)] = tuple(int(c) for c in color)
+
+    return lambda color: palette[tuple(c // color_coeff for c in color)]
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (67, 93, 3), dtype=np.uint8)
+
+
+def assert_close(result, expected):
+    assert np.abs(result.astype(int) - expected.astype(int)).max() <= 1
+
+
+@pytest.mark.parametrize("pixel_size", [2, 3, 7, 16])
+@pytest.mark.parametrize("color_level", ImageHandler.AVAILABLE_COLOR_LEVELS)
+def test_process(image, pixel_size, color_level):
+    expected = image.copy()
+    baseline_pixelize_area(
+        expected, 0, 0, *image.shape[:2], pixel_size, baseline_palette(color_level)
+    )
+
+    ImageHandler(image).process(color_level, pixel_size)
+
+    assert_close(image, expected)
+
+
+@pytest.mark.parametrize("pixel_size", [2, 3, 7, 16])
+def test_pixelize(image, pixel_size):
+    expected = image.copy()
+    baseline_pixelize_area(expected, 0, 0, *image.shape[:2], pixel_size)
+
+    ImageHandler(image).pixelize(pixel_size)
+
+    assert_close(image, expected)
+
+
+def test_pixelize_faces(image, monkeypatch):
+    face_recognition = types.ModuleType("face_recognition")
+    face_recognition.face_locations = lambda _: [(5, 60, 45, 20)]
+    monkeypatch.setitem(sys.modules, "face_recognition", face_recognition)
+    expected = image.copy()
+    baseline_pixelize_area(expected, 5, 20, 40, 40, 5)
+
+    assert ImageHandler(image).pixelize_faces()
+
+    assert_close(image, expected)
+
+
+def baseline_video_color(image, y, x, side):
+    y_border = min(y + side, image.shape[0])
+    x_border = min(x + side, image.shape[1])
+    color_sum = image[y:y_border, x:x_border].sum((0, 1))
+    return np.round(color_sum / side**2)
+
+
+@pytest.mark.parametrize("pixel_size", [2, 3, 7, 16])
+def test_pixelize_for_video(image, pixel_size):
+    height, width = image.shape[:2]
+    side = pixel_size - 1
+
+    result = image.copy()
+    ImageHandler(result).pixelize_for_video(pixel_size)
+
+    for y in range(0, height, pixel_size):
+        for x in range(0, width, pixel_size):
+            block = result[y : y + pixel_size, x : x + pixel_size].astype(int)
+            # Baseline divided every block by side**2, border blocks are divided
+            # by their real area now
+            if y + side <= height and x + side <= width:
+                expected = baseline_video_color(image, y, x, side)
+            else:
+                expected = baseline_average_color(image, y, x, height, width, side)
+            assert np.abs(block - expected).max() <= 1, (y, x)
+
+
+def baseline_pixelize_region(image, x, y, width, height, pixel_size):
+    x_border = min(x + width, image.shape[1])
+    y_border = min(y + height, image.shape[0])
+    x, y = max(x, 0), max(y, 0)
+    region = image[y:y_border, x:x_border].copy()
+    baseline_pixelize_area(region, 0, 0, y_border - y, x_border - x, pixel_size)
+    image[y:y_border, x:x_border] = region
+    return x, y, x_border, y_border
+
+
+@pytest.mark.parametrize("pixel_size", [2, 7, 16])
+def test_pixelize_regions(image, pixel_size):
+    # The second region is clipped by the right and bottom borders
+    regions = [(5, 7, 30, 20), (60, 40, 50, 50)]
+
+    expected = image.copy()
+    changed = np.zeros(image.shape[:2], dtype=bool)
+    for region in regions:
+        x, y, x_border, y_border = baseline_pixelize_region(
+            expected, *region, pixel_size
+        )
+        changed[y:y_border, x:x_border] = True
+
+    result = image.copy()
+    ImageHandler(result).pixelize_regions(pixel_size, regions)
+
+    assert (result[~changed] == image[~changed]).all()
+    assert_close(result, expected)
+
+
+def test_pixelize_regions_out_of_frame(image):
+    result = image.copy()
+    ImageHandler(result).pixelize_regions(8, [(100, 10, 20, 20), (10, 70, 5, 5)])
+
+    assert (result == image).all()
+
+
+def test_pixelize_regions_clamped_pixel_size(image):
+    # Pixels are clamped to 5 by the width and to 3 by the clipped height
+    regions = [(10, 10, 5, 40), (-10, -10, 40, 13)]
+
+    expected = image.copy()
+    baseline_pixelize_region(expected, *regions[0], 5)
+    baseline_pixelize_region(expected, *regions[1], 3)
+
+    result = image.copy()
+    ImageHandler(result).pixelize_regions(16, regions)
+
+    assert_close(result, expected)
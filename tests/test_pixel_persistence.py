@@ -0,0 +1,91 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from pixel_persistence import SQLitePersistence
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "persistence.db")
+
+
+def fail_first_write(persistence: SQLitePersistence) -> list:
+    """Makes the first write to database fail, like a database locked by another process
+
+    Returns:
+        list: batches of user data passed to every write
+    """
+    write = persistence._SQLitePersistence__write
+    batches = []
+
+    def locked_write(user_data, conversations):
+        batches.append(dict(user_data))
+        if len(batches) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        write(user_data, conversations)
+
+    persistence._SQLitePersistence__write = locked_write
+    return batches
+
+
+async def read(path: str):
+    persistence = SQLitePersistence(path)
+    user_data = await persistence.get_user_data()
+    conversations = await persistence.get_conversations("video")
+    await persistence.flush()
+    return user_data, conversations
+
+
+def test_round_trip(path):
+    async def update():
+        persistence = SQLitePersistence(path, flush_interval=60)
+        await persistence.update_user_data(1, {"pixel_size_image": 8})
+        await persistence.update_user_data(2, {"pixel_size_image": 16})
+        await persistence.drop_user_data(2)
+        await persistence.update_conversation("video", (1, 1), 2)
+        await persistence.update_conversation("video", (2, 2), 1)
+        await persistence.update_conversation("video", (2, 2), None)
+        await persistence.flush()
+
+    asyncio.run(update())
+
+    assert asyncio.run(read(path)) == ({1: {"pixel_size_image": 8}}, {(1, 1): 2})
+
+
+def test_failed_write_is_retried(path):
+    async def update():
+        persistence = SQLitePersistence(path, flush_interval=0.01)
+        batches = fail_first_write(persistence)
+        await persistence.update_user_data(1, {"pixel_size_image": 8})
+        await persistence.update_user_data(2, {"pixel_size_image": 16})
+        await asyncio.sleep(0.1)
+
+        # Newer data isn't overwritten by the failed batch
+        await persistence.update_user_data(2, {"pixel_size_image": 32})
+        await persistence.flush()
+        return batches
+
+    batches = asyncio.run(update())
+
+    assert len(batches) >= 2
+    assert asyncio.run(read(path))[0] == {
+        1: {"pixel_size_image": 8},
+        2: {"pixel_size_image": 32},
+    }
+
+
+def test_failed_flush_keeps_changes(path):
+    async def update():
+        persistence = SQLitePersistence(path, flush_interval=60)
+        fail_first_write(persistence)
+        await persistence.update_user_data(1, {"pixel_size_image": 8})
+
+        with pytest.raises(sqlite3.OperationalError):
+            await persistence.flush()
+        await persistence.flush()
+
+    asyncio.run(update())
+
+    assert asyncio.run(read(path))[0] == {1: {"pixel_size_image": 8}}
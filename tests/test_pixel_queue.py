@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+import pixel_queue
+from pixel_queue import TaskQueue
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pixel_queue.time, "time", lambda: now[0])
+    return now
+
+
+def test_take_in_fifo_order(path):
+    task_queue = TaskQueue(path)
+    ids = [task_queue.put(TaskQueue.IMAGE, {"number": number}) for number in range(3)]
+
+    for number, task_id in enumerate(ids):
+        assert task_queue.take("worker") == (
+            task_id,
+            TaskQueue.IMAGE,
+            {"number": number},
+        )
+    assert task_queue.take("worker") is None
+
+
+def test_task_is_not_taken_twice(path):
+    task_queue = TaskQueue(path)
+    ids = [task_queue.put(TaskQueue.VIDEO, {}) for _ in range(200)]
+
+    taken = []
+
+    def take_all(name):
+        # Every worker has its own connection, like separate processes
+        worker_queue = TaskQueue(path)
+        while (task := worker_queue.take(name)) is not None:
+            taken.append(task[0])
+
+    workers = [
+        threading.Thread(target=take_all, args=(f"worker{number}",))
+        for number in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(taken) == ids
+
+
+def test_expired_task_is_taken_again(path, clock):
+    task_queue = TaskQueue(path, claim_timeout=60)
+    task_id = task_queue.put(TaskQueue.IMAGE, {})
+    assert task_queue.take("crashed")[0] == task_id
+
+    clock[0] += 59
+    assert task_queue.take("worker") is None
+
+    clock[0] += 2
+    assert task_queue.take("worker")[0] == task_id
+    assert task_queue.take("worker") is None
+
+
+def test_failed_task_is_not_taken(path, clock):
+    task_queue = TaskQueue(path, claim_timeout=60)
+    task_queue.put(TaskQueue.IMAGE, {})
+    task_queue.failed(task_queue.take("worker")[0])
+
+    clock[0] += 3600
+    assert task_queue.take("worker") is None
+
+    task_id = task_queue.put(TaskQueue.IMAGE, {})
+    assert task_queue.take("worker")[0] == task_id
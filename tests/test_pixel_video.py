@@ -0,0 +1,66 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from pixel_video import VideoHandler, get_motion_regions
+
+FRAMES = 30
+
+
+def test_moving_square_is_one_region():
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    square = rng.integers(0, 256, (24, 24, 3), dtype=np.uint8)
+
+    background_subtractor = cv2.createBackgroundSubtractorMOG2()
+    for number in range(FRAMES):
+        frame = background.copy()
+        x, y = 10 + 3 * number, 40
+        frame[y : y + 24, x : x + 24] = square
+        regions = get_motion_regions(background_subtractor, frame)
+
+    assert len(regions) == 1
+    region_x, region_y, width, height = regions[0]
+    # The region is dilated by a few pixels and can lag behind the square
+    assert abs(region_x - x) <= 4 and abs(region_y - y) <= 4
+    assert 24 <= width <= 32 and 24 <= height <= 32
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("download")
+    path = "download/video.mp4"
+
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (64, 48))
+    for number in range(FRAMES):
+        out.write(np.full((48, 64, 3), number * 8, dtype=np.uint8))
+    out.release()
+    return path
+
+
+def test_process_video_part(video):
+    handler = VideoHandler(video)
+    num_processes = handler._VideoHandler__num_processes
+    os.mkdir("temp/video")
+
+    frames = []
+
+    def count_frame(frame) -> bool:
+        frames.append(frame.shape)
+        return len(frames) == FRAMES
+
+    found = [
+        handler._VideoHandler__process_video_part(part_number, count_frame)
+        for part_number in range(num_processes)
+    ]
+
+    assert frames == [(48, 64, 3)] * FRAMES
+    # Only the last frame is reported, it's in the last part
+    assert found == [False] * (num_processes - 1) + [True]
+    for part_number in range(num_processes):
+        part = cv2.VideoCapture(f"temp/video/part_{part_number}.mp4")
+        assert part.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        part.release()
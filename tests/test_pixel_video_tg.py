@@ -0,0 +1,25 @@
+import pytest
+
+from pixel_video_tg import parse_regions
+
+
+def test_parse_regions():
+    assert parse_regions("0 0 10 20\n\n 5 6 7 8 \n") == [[0, 0, 10, 20], [5, 6, 7, 8]]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "\n \n",
+        "1 2 3 ²",
+        "1 2 3",
+        "1 2 3 4 5",
+        "1 2 0 4",
+        "1 2 3 0",
+        "-1 2 3 4",
+        "1 2 3 4\n1 2 3",
+    ],
+)
+def test_parse_invalid_regions(text):
+    assert parse_regions(text) is None
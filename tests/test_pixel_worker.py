@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+import pytest
+from telegram.error import BadRequest, NetworkError
+
+import pixel_worker
+from pixel_queue import TaskQueue
+
+TASK = {"chat_id": 1, "message_id": 2, "file_id": "file", "user": "@user"}
+
+
+class StubBot:
+    """Bot, which can't download files and records sent messages"""
+
+    def __init__(self, fail_sending: bool = False) -> None:
+        self.fail_sending = fail_sending
+        self.messages = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def get_file(self, file_id: str):
+        raise BadRequest("File is too big")
+
+    async def send_message(self, chat_id, text, reply_to_message_id=None) -> None:
+        if self.fail_sending:
+            raise NetworkError("Connection lost")
+        self.messages.append((chat_id, text, reply_to_message_id))
+
+
+def test_send_error_known_reply():
+    bot = StubBot()
+    asyncio.run(pixel_worker.send_error(bot, TASK, BadRequest("File is too big")))
+
+    assert bot.messages == [
+        (1, "Файл слишком большой!\nМаксимальный размер файла равен 20 МБ", 2)
+    ]
+
+
+def test_send_error_generic_reply():
+    bot = StubBot()
+    asyncio.run(pixel_worker.send_error(bot, TASK, ValueError()))
+
+    assert bot.messages == [(1, "Не удалось обработать файл, попробуйте ещё раз.", 2)]
+
+
+def test_send_error_failed_sending():
+    bot = StubBot(fail_sending=True)
+    asyncio.run(pixel_worker.send_error(bot, TASK, ValueError()))
+
+    assert bot.messages == []
+
+
+def test_failed_task_is_replied(tmp_path, monkeypatch):
+    task_queue = TaskQueue(str(tmp_path / "queue.db"))
+    task_queue.put(TaskQueue.VIDEO, {**TASK, "pixel_size": 8, "regions": None})
+    bot = StubBot()
+    monkeypatch.setattr(pixel_worker, "get_task_queue", lambda: task_queue)
+    monkeypatch.setattr(pixel_worker, "Bot", lambda *args, **kwargs: bot)
+    monkeypatch.setattr(pixel_worker, "POLL_INTERVAL", 0.01)
+
+    # The worker runs until interrupted
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(pixel_worker.work("worker"), 0.5))
+
+    assert bot.messages == [
+        (1, "Файл слишком большой!\nМаксимальный размер файла равен 20 МБ", 2)
+    ]
+    assert task_queue.take("worker") is None
+
+
+class StubVideoFile:
+    file_unique_id = "video"
+
+    async def download_to_drive(self, path: str) -> None:
+        with open(path, "wb") as video:
+            video.write(b"video")
+
+
+def test_video_is_removed_after_failure(tmp_path, monkeypatch):
+    bot = StubBot()
+    downloaded = []
+
+    async def get_file(file_id: str):
+        return StubVideoFile()
+
+    def failed_handler(path: str):
+        downloaded.append(path)
+        raise RuntimeError("ffmpeg failed")
+
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("download")
+    monkeypatch.setattr(bot, "get_file", get_file)
+    monkeypatch.setattr(pixel_worker, "VideoHandler", failed_handler)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            pixel_worker.process_video(
+                bot, TaskQueue.VIDEO, {**TASK, "pixel_size": 8, "regions": None}
+            )
+        )
+
+    assert len(downloaded) == 1
+    assert not os.path.exists(downloaded[0])
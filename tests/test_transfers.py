@@ -0,0 +1,221 @@
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+from telegram import Update
+from telegram.ext import (
+    Application,
+    ApplicationBuilder,
+    MessageHandler,
+    TypeHandler,
+    filters,
+)
+from telegram.request import HTTPXRequest
+
+import pixel_image_tg as pixel_image
+from pixel_request import create_media_request
+
+DELAY = 0.2
+USERS = 8
+TOKEN = "1:TEST"
+
+
+class FakeBotApi:
+    """Local Bot API server, which answers every request after a delay,
+    so transfers of different users can only overlap in time
+    """
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.photos_sent = 0
+        self.all_photos_sent = asyncio.Event()
+        _, image = cv2.imencode(".jpg", np.zeros((64, 64, 3), dtype=np.uint8))
+        self.image = image.tobytes()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer) -> None:
+        try:
+            while request := await self.read_request(reader):
+                path, body = request
+                status, content_type, content = await self.respond(path, body)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(content)}\r\n\r\n".encode() + content
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+
+        lines = head.decode().split("\r\n")
+        path = lines[0].split()[1]
+        headers = dict(
+            line.lower().split(": ", 1) for line in lines[1:] if ": " in line
+        )
+        body = b""
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding") == "chunked":
+            while size := int((await reader.readline()).strip(), 16):
+                body += await reader.readexactly(size + 2)
+            await reader.readline()
+        return path, body
+
+    async def respond(self, path: str, body: bytes):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+
+        if path.startswith("/file/"):
+            return "200 OK", "image/jpeg", self.image
+
+        match path.rsplit("/", 1)[-1]:
+            case "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "bot"}
+                result["username"] = "bot"
+            case "getFile":
+                result = {
+                    "file_id": "photo",
+                    "file_unique_id": "photo",
+                    "file_size": len(self.image),
+                    "file_path": "photos/photo.jpg",
+                }
+            case "sendPhoto":
+                result = {
+                    "message_id": 1,
+                    "date": 0,
+                    "chat": {"id": 1, "type": "private"},
+                }
+                self.photos_sent += 1
+                if self.photos_sent == USERS:
+                    self.all_photos_sent.set()
+            case _:
+                return "404 Not Found", "application/json", b"{}"
+
+        content = json.dumps({"ok": True, "result": result}).encode()
+        return "200 OK", "application/json", content
+
+
+def photo_update(application: Application, number: int) -> Update:
+    user = {"id": 100 + number, "is_bot": False, "first_name": f"user{number}"}
+    return Update.de_json(
+        {
+            "update_id": number,
+            "message": {
+                "message_id": number,
+                "date": 0,
+                "chat": {"id": user["id"], "type": "private"},
+                "from": user,
+                "photo": [
+                    {
+                        "file_id": "photo",
+                        "file_unique_id": "photo",
+                        "width": 64,
+                        "height": 64,
+                    }
+                ],
+            },
+        },
+        application.bot,
+    )
+
+
+async def set_settings(update: Update, context) -> None:
+    context.user_data["color_level_image"] = 256
+    context.user_data["pixel_size_image"] = 4
+
+
+async def process_photos(request: HTTPXRequest, block: bool, name: str) -> float:
+    """Sends photos of all users to pixel_image.process,
+    which downloads, processes and uploads every photo
+
+    Returns:
+        float: time in seconds, until results are sent to all users
+    """
+    fake_bot_api = FakeBotApi(DELAY)
+    url = await fake_bot_api.start()
+    application = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"{url}/bot")
+        .base_file_url(f"{url}/file/bot")
+        .request(request)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, set_settings), group=-1)
+    application.add_handler(
+        MessageHandler(filters.PHOTO, pixel_image.process, block=block)
+    )
+
+    async with application:
+        await application.start()
+        start = time.perf_counter()
+        for number in range(USERS):
+            await application.process_update(photo_update(application, number))
+        await asyncio.wait_for(fake_bot_api.all_photos_sent.wait(), 30)
+        elapsed = time.perf_counter() - start
+        await application.stop()
+
+    await fake_bot_api.stop()
+    print(
+        f"\n{name}: {USERS / elapsed:.1f} users/s, "
+        f"{fake_bot_api.max_active} concurrent requests"
+    )
+    return elapsed
+
+
+@pytest.fixture(autouse=True)
+def no_task_queue(monkeypatch):
+    monkeypatch.delenv("TASK_QUEUE", raising=False)
+
+
+def test_non_blocking_handlers_overlap_transfers():
+    # getFile, file download and sendPhoto for every user
+    sequential = 3 * DELAY * USERS
+
+    blocking = asyncio.run(
+        process_photos(create_media_request(), True, "blocking handler")
+    )
+    non_blocking = asyncio.run(
+        process_photos(create_media_request(), False, "non-blocking handler")
+    )
+
+    assert blocking >= sequential
+    assert non_blocking < sequential / 2
+
+
+def test_pooled_request_overlaps_transfers():
+    single_connection = HTTPXRequest(connection_pool_size=1, pool_timeout=None)
+
+    pooled = asyncio.run(
+        process_photos(create_media_request(), False, "media request pool")
+    )
+    not_pooled = asyncio.run(
+        process_photos(single_connection, False, "single connection")
+    )
+
+    assert not_pooled >= 3 * DELAY * USERS
+    assert pooled < not_pooled / 2